@@ -1,48 +1,95 @@
 #!/usr/bin/env pypy3
+import heapq
 from functools import reduce
+import utils
 
 
-def siblings(cave_map, x, y):
-    if x > 0:
-        yield (x - 1, y)
-    if x < len(cave_map[y]) - 1:
-        yield (x + 1, y)
-    if y > 0:
-        yield (x, y - 1)
-    if y < len(cave_map) - 1:
-        yield (x, y + 1)
+def label_basins(cave):
+    heights = cave.values
+    neighbours = cave.neighbour_table()
+    seen = bytearray(len(heights))
 
+    basin_sizes = []
+    total_risk = 0
+    for idx, height in enumerate(heights):
+        if all(heights[neighbour] > height for neighbour in neighbours[idx]):
+            total_risk += height + 1
 
-def find_basin(cave_map, seen_points, basin_points, x, y):
-    if (x, y) in seen_points:
-        return basin_points
+        if seen[idx] or height == 9:
+            continue
 
-    seen_points.add((x, y))
-    if cave_map[y][x] == 9:
-        return basin_points
+        seen[idx] = 1
+        basin = [idx]
+        for point in basin:
+            for neighbour in neighbours[point]:
+                if not seen[neighbour] and heights[neighbour] != 9:
+                    seen[neighbour] = 1
+                    basin.append(neighbour)
+        basin_sizes.append(len(basin))
 
-    basin_points.add((x, y))
-    for x, y in list(basin_points):
-        for x1, y1 in siblings(cave_map, x, y):
-            find_basin(cave_map, seen_points, basin_points, x1, y1)
+    return basin_sizes, total_risk
 
-    return basin_points
 
+def stream_basins(f):
+    # only the previous row's labels and the components touching it are kept in memory
+    parent = {}
+    sizes = {}
+    labels = []
+    next_label = 0
+
+    def find(label):
+        while parent[label] != label:
+            parent[label] = parent[parent[label]]
+            label = parent[label]
+        return label
+
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        previous = labels
+        labels = [None] * len(line)
+        for x, c in enumerate(line):
+            if c == "9":
+                continue
+            up = previous[x] if previous else None
+            left = labels[x - 1] if x > 0 else None
+            if up is None and left is None:
+                label = next_label
+                next_label += 1
+                parent[label] = label
+                sizes[label] = 0
+            elif up is None or left is None:
+                label = find(up if left is None else left)
+            else:
+                label = find(up)
+                other = find(left)
+                if label != other:
+                    parent[other] = label
+                    sizes[label] += sizes.pop(other)
+            sizes[label] += 1
+            labels[x] = label
+
+        labels = [None if label is None else find(label) for label in labels]
+        active = set(labels)
+        active.discard(None)
+        for label in set(sizes) - active:
+            yield sizes.pop(label)
+        parent = {label: label for label in active}
+
+    yield from sizes.values()
 
-def main():
-    total_risk = 0
 
-    cave_map = [[int(i) for i in list(line.strip())] for line in open("/Users/zee/Downloads/input-2.txt").readlines()]
+def main(streaming=False):
+    if streaming:
+        result = reduce(lambda a, b: a * b, heapq.nlargest(3, stream_basins(utils.input())), 1)
+        print(f"result: {result}")
+        return
 
-    seen_points = set()
-    basins = []
-    for y in range(len(cave_map)):
-        for x in range(len(cave_map[0])):
-            basin = find_basin(cave_map, seen_points, set(), x, y)
-            if basin:
-                basins.append(basin)
+    basin_sizes, total_risk = label_basins(utils.load_matrix(utils.INPUT))
+    print(f"risk: {total_risk}")
 
-    result = reduce(lambda a, b: a * len(b), sorted(basins, key=len, reverse=True)[:3], 1)
+    result = reduce(lambda a, b: a * b, sorted(basin_sizes, reverse=True)[:3], 1)
     print(f"result: {result}")
 
 
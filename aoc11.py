@@ -1,67 +1,132 @@
 #!/usr/bin/env python3
+import itertools
 import utils
 
+FLASH = 10
+INCREMENT = bytes(min(v + 1, 255) for v in range(256))
+RESET = bytes(0 if v >= FLASH else v for v in range(256))
+
 
 class CaveMap:
     def __init__(self, data):
-        self.data = data.values
+        # element values, not the raw machine words of e.g. an array("i")
+        self.data = bytearray(list(data.values))
         self.width = data.width
         self.height = data.height
+        self.neighbours = data.neighbour_table(utils.DIAGONAL)
 
     def __str__(self):
-        return "\n".join("".join(str(i) if i <= 9 else "X" for i in line) for line in self.data) + "\n"
+        rows = (self.data[y * self.width : (y + 1) * self.width] for y in range(self.height))
+        return "\n".join("".join(str(i) if i <= 9 else "X" for i in row) for row in rows) + "\n"
+
+    def step(self):
+        data = self.data.translate(INCREMENT)
+
+        pending = []
+        idx = data.find(FLASH)
+        while idx != -1:
+            pending.append(idx)
+            idx = data.find(FLASH, idx + 1)
 
-    def check_flash(self, flashed, x, y):
         flash_count = 0
-        if self.data[y][x] > 9 and (x, y) not in flashed:
+        while pending:
             flash_count += 1
-            flashed.add((x, y))
-            for x2, y2 in self.sibling_coords(x, y):
-                self.data[y2][x2] += 1
-                flash_count += self.check_flash(flashed, x2, y2)
+            for neighbour in self.neighbours[pending.pop()]:
+                data[neighbour] += 1
+                if data[neighbour] == FLASH:
+                    pending.append(neighbour)
+
+        self.data = data.translate(RESET)
         return flash_count
 
-    def sibling_coords(self, x, y):
-        for dx in [-1, 0, 1]:
-            for dy in [-1, 0, 1]:
-                if dx == 0 and dy == 0:
-                    continue
-                if x + dx < 0 or x + dx >= self.width:
-                    continue
-                if y + dy < 0 or y + dy >= self.height:
-                    continue
-                yield x + dx, y + dy
+    def run_until_synchronized(self, limit=None):
+        size = self.width * self.height
+        for i in itertools.count(1):
+            if self.step() == size:
+                return i
+            if i == limit:
+                return None
 
-    def step(self):
-        for y in range(0, self.height):
-            for x in range(0, self.width):
-                self.data[y][x] += 1
 
-        flash_count = 0
-        flashed = set()
-        for y in range(0, self.height):
-            for x in range(0, self.width):
-                flash_count += self.check_flash(flashed, x, y)
+class Bitboard:
+    # bit-sliced energy levels: planes[i] holds bit i of every cell, rows padded with a zero guard column
+    def __init__(self, planes, width, height):
+        self.planes = list(planes)
+        self.width = width
+        self.height = height
+        self.stride = width + 1
+        self.mask = sum(((1 << width) - 1) << (y * self.stride) for y in range(height))
+        self.offsets = [dy * self.stride + dx for dx, dy in utils.DIAGONAL]
+
+    @staticmethod
+    def from_matrix(data):
+        planes = [0] * 4
+        for y in range(data.height):
+            for x in range(data.width):
+                value = data.value_at(x, y)
+                for i in range(4):
+                    if value & (1 << i):
+                        planes[i] |= 1 << (y * (data.width + 1) + x)
+        return Bitboard(planes, data.width, data.height)
+
+    def key(self):
+        return tuple(self.planes)
 
-        if all(v > 9 for line in self.data for v in line):
-            return True
+    def add(self, cells):
+        carry = cells
+        for i, plane in enumerate(self.planes):
+            self.planes[i] = plane ^ carry
+            carry &= plane
+
+    def take_flashes(self, excluded):
+        b0, b1, b2, b3 = self.planes
+        flashes = ~b0 & b1 & ~b2 & b3 & self.mask & ~excluded
+        self.planes = [plane & ~flashes for plane in self.planes]
+        return flashes
+
+    def step(self):
+        self.add(self.mask)
+        flashed = 0
+        pending = self.take_flashes(0)
+        while pending:
+            flashing = pending
+            flashed |= flashing
+            pending = 0
+            for offset in self.offsets:
+                shifted = flashing << offset if offset > 0 else flashing >> -offset
+                # cells that already flashed stay at 0 until the next step
+                self.add(shifted & self.mask & ~(flashed | pending))
+                pending |= self.take_flashes(flashed | pending)
+        return flashed.bit_count()
 
-        for y in range(0, self.height):
-            for x in range(0, self.width):
-                if self.data[y][x] > 9:
-                    self.data[y][x] = 0
+    def steps_until_synchronized(self):
+        size = self.width * self.height
+        seen = set()
+        for i in itertools.count(1):
+            if self.step() == size:
+                return i
+            if self.key() in seen:
+                # looping through states that never flash all together
+                return None
+            seen.add(self.key())
 
-        return False
+    def flashes_after(self, steps):
+        seen = {self.key(): 0}
+        totals = [0]
+        for i in range(1, steps + 1):
+            totals.append(totals[-1] + self.step())
+            previous = seen.setdefault(self.key(), i)
+            if previous != i:
+                cycle_length = i - previous
+                cycles, remainder = divmod(steps - i, cycle_length)
+                per_cycle = totals[i] - totals[previous]
+                return totals[i] + cycles * per_cycle + totals[previous + remainder] - totals[previous]
+        return totals[steps]
 
 
 def main():
-    cm = CaveMap(utils.read_matrix(utils.input()))
-    print(cm)
-    for i in range(10000000):
-        print(cm)
-        if cm.step():
-            print(i + 1)
-            return
+    board = Bitboard.from_matrix(utils.load_matrix(utils.INPUT))
+    print(board.steps_until_synchronized())
 
 
 if __name__ == "__main__":
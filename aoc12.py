@@ -1,33 +1,9 @@
 #!/usr/bin/env python3
+import functools
 from collections import defaultdict
 import utils
 
 
-def paths(
-    edges,
-    visit_small_twice_target,
-    current_node="start",
-    current_path=tuple(),
-    visited={"start": 2},
-):
-    current_path += (current_node,)
-
-    if current_node == "end":
-        yield current_path
-        return
-    else:
-        if current_node.islower():
-            visited = visited.copy()
-            visited[current_node] = visited.get(current_node, 0) + (
-                1 if current_node == visit_small_twice_target else 2
-            )
-        for next_node in edges[current_node]:
-            if visited.get(next_node, 0) < 2:
-                yield from paths(
-                    edges, visit_small_twice_target, current_node=next_node, current_path=current_path, visited=visited
-                )
-
-
 def parse_edges(f):
     edges = defaultdict(set)
     for line in f:
@@ -37,20 +13,72 @@ def parse_edges(f):
     return edges
 
 
-def find_paths(edges):
-    seen = set()
-    for node in edges:
-        if node not in ("start", "end") and node.islower():
-            for path in paths(edges, visit_small_twice_target=node):
-                if path not in seen:
-                    seen.add(path)
-                    yield path
+def find_paths(edges, allow_twice=True):
+    # single DFS; the "twice" budget is spent on the first small cave entered a second time
+    path = ["start"]
+    visited = {"start"}
+    twice = None
+    pending = [iter(edges["start"])]
+
+    while pending:
+        next_node = next(pending[-1], None)
+        if next_node is None:
+            pending.pop()
+            node = path.pop()
+            if node == twice:
+                twice = None
+            else:
+                visited.discard(node)
+            continue
+
+        if next_node == "start":
+            continue
+        if next_node == "end":
+            yield tuple(path) + ("end",)
+            continue
 
+        if next_node in visited:
+            if twice is not None or not allow_twice:
+                continue
+            twice = next_node
+        elif next_node.islower():
+            visited.add(next_node)
+        path.append(next_node)
+        pending.append(iter(edges[next_node]))
 
-def main():
+
+def count_paths(edges, allow_twice=True):
+    names = sorted(edges)
+    ids = {name: idx for idx, name in enumerate(names)}
+    small = [name.islower() for name in names]
+    adjacency = [tuple(ids[n] for n in edges[name] if n != "start") for name in names]
+    end = ids["end"]
+
+    @functools.lru_cache(None)
+    def count(node, visited, twice_used):
+        if node == end:
+            return 1
+        total = 0
+        for next_node in adjacency[node]:
+            bit = 1 << next_node if small[next_node] else 0
+            if visited & bit:
+                if not twice_used:
+                    total += count(next_node, visited, True)
+            else:
+                total += count(next_node, visited | bit, twice_used)
+        return total
+
+    start = ids["start"]
+    return count(start, 1 << start, not allow_twice)
+
+
+def main(count_only=False, out=None):
     edges = parse_edges(utils.input())
+    if count_only:
+        print(count_paths(edges))
+        return
     for path in find_paths(edges):
-        print(path)
+        print(",".join(path), file=out)
 
 
 if __name__ == "__main__":
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import functools
+import itertools
 from collections import Counter
 import utils
 
@@ -33,15 +34,95 @@ def polymerizer_for(rules):
     return polymerize_inner
 
 
+class PairSystem:
+    def __init__(self, initial, rules):
+        self.elements = sorted(set(initial) | set(rules.values()) | set(c for pair in rules for c in pair))
+        self.pairs = list(itertools.product(self.elements, repeat=2))
+        self.index = {pair: i for i, pair in enumerate(self.pairs)}
+        self.last = initial[-1]
+
+        # children[i]: indices of the pairs that pair i turns into after one step
+        self.children = []
+        for a, b in self.pairs:
+            insertion = rules.get((a, b))
+            if insertion is None:
+                self.children.append((self.index[(a, b)],))
+            else:
+                self.children.append((self.index[(a, insertion)], self.index[(insertion, b)]))
+
+        self.initial = [0] * len(self.pairs)
+        for pair in zip(initial, initial[1:]):
+            self.initial[self.index[pair]] += 1
+
+    def step(self, vector, modulus=None):
+        result = [0] * len(vector)
+        for count, children in zip(vector, self.children):
+            if count:
+                for child in children:
+                    result[child] += count
+        if modulus:
+            result = [v % modulus for v in result]
+        return result
+
+    def transition_matrix(self):
+        size = len(self.pairs)
+        matrix = [[0] * size for _ in range(size)]
+        for i, children in enumerate(self.children):
+            for child in children:
+                matrix[i][child] += 1
+        return matrix
+
+    @staticmethod
+    def apply(vector, matrix, modulus=None):
+        result = [0] * len(vector)
+        for count, row in zip(vector, matrix):
+            if count:
+                for j, v in enumerate(row):
+                    if v:
+                        result[j] += count * v
+        if modulus:
+            result = [v % modulus for v in result]
+        return result
+
+    @staticmethod
+    def multiply(a, b, modulus=None):
+        return [PairSystem.apply(row, b, modulus) for row in a]
+
+    def advance(self, steps, modulus=None):
+        vector = self.initial
+        matrix = self.transition_matrix()
+        while steps:
+            if steps & 1:
+                vector = self.apply(vector, matrix, modulus)
+            steps >>= 1
+            if steps:
+                matrix = self.multiply(matrix, matrix, modulus)
+        return vector
+
+    def histogram(self, vector, modulus=None):
+        # every element is the first of a pair, except the (never changing) last one
+        result = Counter({self.last: 1})
+        for (a, _), count in zip(self.pairs, vector):
+            # elements the rules mention but that haven't been produced yet stay out
+            if count:
+                result[a] += count
+        if modulus:
+            result = Counter({k: v % modulus for k, v in result.items()})
+        return result
+
+    def element_counts(self, steps, modulus=None):
+        return self.histogram(self.advance(steps, modulus), modulus)
+
+    def histograms(self, steps):
+        vector = self.initial
+        for _ in range(steps):
+            vector = self.step(vector)
+            yield self.histogram(vector)
+
+
 def main():
     current, rules = parse_input(utils.input())
-    polymerizer = polymerizer_for(rules)
-    iterations = 40
-
-    totals = Counter(current[0])
-    for a, b in zip(current, current[1:]):
-        totals += polymerizer(a, b, iterations)
-        totals[a] -= 1
+    totals = PairSystem(current, rules).element_counts(40)
     print(totals)
     print(max(totals.values()) - min(totals.values()))
 
@@ -1,60 +1,96 @@
 #!/usr/bin/env python3
-import sortedcontainers
-import math
+import heapq
 import utils
+from array import array
 
 
-def find_path(cave):
-    candidates = sortedcontainers.SortedSet()
-    scores = {utils.Point(x, y): math.inf for x in range(cave.width) for y in range(cave.height)}
-    current_node = utils.Point(0, 0)
-    scores[current_node] = 0
-    target_node = (cave.width - 1, cave.height - 1)
+def find_path(cave, astar=False, with_path=False):
+    width, height = cave.width, cave.height
+    risks = cave.values
+    neighbours = cave.neighbour_table()
+    size = width * height
+    target = size - 1
 
-    while True:
-        current_score = scores[current_node]
-        print(f"{current_node}, {current_score}, {len(candidates)}")
+    def estimate(node):
+        if not astar:
+            return 0
+        y, x = divmod(node, width)
+        return (width - 1 - x) + (height - 1 - y)
 
-        for neighbour in cave.neighbours(current_node.x, current_node.y):
-            new_value = current_score + cave.value_at(neighbour.x, neighbour.y)
+    scores = array("q", [-1]) * size
+    visited = bytearray(size)
+    previous = array("q", [-1]) * size if with_path else None
+    scores[0] = 0
+    pending = [(estimate(0), 0)]
 
-            current_value = scores[neighbour]
-            if new_value < current_value:
-                scores[neighbour] = new_value
-                candidates.add(neighbour)
+    while pending:
+        _, node = heapq.heappop(pending)
+        if visited[node]:
+            continue
+        visited[node] = 1
+        if node == target:
+            break
 
-        if len(candidates) == 0:
-            return scores[target_node]
-        else:
-            current_node = candidates.pop(0)
+        score = scores[node]
+        for neighbour in neighbours[node]:
+            if visited[neighbour]:
+                continue
+            new_score = score + risks[neighbour]
+            current_score = scores[neighbour]
+            if current_score == -1 or new_score < current_score:
+                scores[neighbour] = new_score
+                if with_path:
+                    previous[neighbour] = node
+                heapq.heappush(pending, (new_score + estimate(neighbour), neighbour))
 
+    if not with_path:
+        return scores[target]
 
-def expand(cave):
-    new_cave = utils.Matrix([[0] * cave.width * 5 for y in range(cave.height * 5)])
-    for y in range(cave.width):
-        for x in range(cave.height):
-            new_cave.set_value_at(x, y, cave.value_at(x, y))
+    path = []
+    node = target
+    while node != -1:
+        path.append(cave.point(node))
+        node = previous[node]
+    return scores[target], path[::-1]
 
-    for i in range(1, 5):
-        for y in range(cave.height):
-            for x in range(cave.width):
-                new_value = new_cave.value_at(x + cave.width * (i - 1), y) + 1
-                if new_value > 9:
-                    new_value = 1
-                new_cave.set_value_at(x + cave.width * i, y, new_value)
-    for i in range(1, 5):
-        for y in range(cave.height):
-            for x in range(new_cave.width):
-                new_value = new_cave.value_at(x, y + cave.height * (i - 1)) + 1
-                if new_value > 9:
-                    new_value = 1
-                new_cave.set_value_at(x, y + cave.height * i, new_value)
 
-    return new_cave
+class TiledValues:
+    def __init__(self, base, tiles_x, tiles_y):
+        self.base = base
+        self.width = base.width * tiles_x
+        self.height = base.height * tiles_y
+
+    def __len__(self):
+        return self.width * self.height
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        y, x = divmod(idx, self.width)
+        tile_y, base_y = divmod(y, self.base.height)
+        tile_x, base_x = divmod(x, self.base.width)
+        return (self.base.value_at(base_x, base_y) + tile_x + tile_y - 1) % 9 + 1
+
+
+class TiledCave(utils.Matrix):
+    def __init__(self, base, tiles_x=5, tiles_y=None):
+        self.values = TiledValues(base, tiles_x, tiles_y or tiles_x)
+        self.width = self.values.width
+        self.height = self.values.height
+
+    def set_value_at(self, x, y, value):
+        raise TypeError("tiled caves are read-only")
+
+    def neighbour_table(self, deltas=utils.ORTHOGONAL, wrap=False):
+        return utils.NeighbourView(self.width, self.height, deltas, wrap)
+
+
+def expand(cave, tiles=5):
+    return TiledCave(cave, tiles)
 
 
 def main():
-    cave = utils.read_matrix(utils.input())
+    cave = utils.load_matrix(utils.INPUT)
     expanded = expand(cave)
     print(find_path(expanded))
 
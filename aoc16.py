@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import functools
+import multiprocessing
 import operator
 import utils
 
@@ -12,22 +13,10 @@ class BITSStream:
         self.pos = 0
 
     def next_bits(self, n):
-        result = 0
-        while n > 0:
-            src_byte = self.pos // 8
-            src_bit = self.pos % 8
-            read_bits = min(n, 8 - src_bit)
-
-            mask = (1 << read_bits) - 1
-            src = self.data[src_byte]
-
-            data = (src >> (8 - (src_bit + read_bits))) & mask
-            result |= data
-
-            n -= read_bits
-            self.pos += read_bits
-            result <<= n
-        return result
+        start = self.pos // 8
+        end = (self.pos + n + 7) // 8
+        self.pos += n
+        return (int.from_bytes(self.data[start:end], "big") >> (end * 8 - self.pos)) & ((1 << n) - 1)
 
 
 class PacketBase:
@@ -145,30 +134,232 @@ def read_literal_value(stream):
             return value
 
 
+FOLDS = {
+    0: operator.add,
+    1: operator.mul,
+    2: min,
+    3: max,
+    5: lambda a, b: 1 if a > b else 0,
+    6: lambda a, b: 1 if a < b else 0,
+    7: lambda a, b: 1 if a == b else 0,
+}
+
+EVALUATORS = {type_id: functools.partial(functools.reduce, fold) for type_id, fold in FOLDS.items()}
+
+
+class PendingOperator:
+    def __init__(self, version, type_id, by_length, limit):
+        self.version = version
+        self.type_id = type_id
+        self.by_length = by_length
+        self.limit = limit
+        self.children = []
+        self.count = 0
+
+    def add(self, child):
+        self.children.append(child)
+        self.count += 1
+
+    def complete(self, pos):
+        return pos >= self.limit if self.by_length else self.count >= self.limit
+
+
+def walk(stream, literal, combine):
+    # explicit stack instead of recursion; children are reduced as soon as their operator is complete
+    version_total = 0
+    pending = []
+    while True:
+        version = stream.next_bits(3)
+        type_id = stream.next_bits(3)
+        version_total += version
+        if type_id == 4:
+            result = literal(version, read_literal_value(stream))
+        else:
+            by_length = stream.next_bits(1) == 0
+            limit = stream.next_bits(15) if by_length else stream.next_bits(11)
+            if by_length:
+                limit += stream.pos
+            pending.append(PendingOperator(version, type_id, by_length, limit))
+            if not pending[-1].complete(stream.pos):
+                continue
+            op = pending.pop()
+            result = combine(op.version, op.type_id, op.children)
+
+        while pending:
+            pending[-1].add(result)
+            if not pending[-1].complete(stream.pos):
+                break
+            op = pending.pop()
+            result = combine(op.version, op.type_id, op.children)
+        else:
+            return version_total, result
+
+
+def evaluate(stream):
+    return walk(stream, lambda version, value: value, lambda version, type_id, values: EVALUATORS[type_id](values))
+
+
 def read_packet(stream):
-    version = stream.next_bits(3)
-    type_id = stream.next_bits(3)
-    if type_id == 4:
-        return Literal(version, read_literal_value(stream))
-    else:
-        length_type = stream.next_bits(1)
-        if length_type == 0:
-            packets = []
-            subpacket_length = stream.next_bits(15)
-            end = stream.pos + subpacket_length
-            while stream.pos < end:
-                packets.append(read_packet(stream))
+    return walk(stream, Literal, lambda version, type_id, packets: OPERATORS[type_id](version, packets))[1]
+
+
+LITERAL = 4
+
+
+def compile_packet(stream):
+    # postfix program of (opcode, literal value) and (opcode, arity) entries
+    program = []
+    version_sum, _ = walk(
+        stream,
+        lambda version, value: program.append((LITERAL, value)),
+        lambda version, type_id, children: program.append((type_id, len(children))),
+    )
+    return version_sum, program
+
+
+def run(program):
+    stack = []
+    for opcode, arg in program:
+        if opcode == LITERAL:
+            stack.append(arg)
         else:
-            subpacket_count = stream.next_bits(11)
-            packets = [read_packet(stream) for _ in range(subpacket_count)]
-        return OPERATORS[type_id](version, packets)
+            split = len(stack) - arg
+            value = EVALUATORS[opcode](stack[split:])
+            del stack[split:]
+            stack.append(value)
+    return stack.pop()
+
+
+def decode_line(line):
+    version_sum, program = compile_packet(BITSStream(line.strip()))
+    return version_sum, run(program)
+
+
+def decode_batch(path, processes=None, chunksize=64):
+    with open(path) as f, multiprocessing.Pool(processes) as pool:
+        return list(pool.imap(decode_line, (line for line in f if line.strip()), chunksize))
+
+
+HEADER, LITERAL_GROUP, OPERATOR_LENGTH, PADDING = range(4)
+
+
+class FoldingOperator(PendingOperator):
+    # keeps a running fold instead of the children
+    def __init__(self, version, type_id, by_length, limit):
+        super().__init__(version, type_id, by_length, limit)
+        self.value = None
+
+    def add(self, value):
+        self.value = value if self.count == 0 else FOLDS[self.type_id](self.value, value)
+        self.count += 1
+
+
+class IncrementalDecoder:
+    # one hex transmission per line; only unconsumed bits and one folding frame per nesting level are kept
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.bits = 0
+        self.available = 0
+        self.pos = 0
+        self.phase = HEADER
+        self.version = None
+        self.type_id = None
+        self.pending = []
+        self.version_total = 0
+        self.literal = 0
+
+    def take(self, n):
+        self.available -= n
+        self.pos += n
+        result = self.bits >> self.available
+        self.bits &= (1 << self.available) - 1
+        return result
+
+    def feed(self, chunk):
+        if isinstance(chunk, bytes):
+            chunk = chunk.decode("ascii")
+        results = []
+        for i, line in enumerate(chunk.split("\n")):
+            if i > 0:
+                self.end_transmission()
+            line = line.strip()
+            if line and self.phase != PADDING:
+                self.bits = (self.bits << (4 * len(line))) | int(line, 16)
+                self.available += 4 * len(line)
+                results.extend(self.advance())
+        return results
+
+    def end_transmission(self):
+        if self.phase != PADDING and (self.pos or self.available):
+            raise ValueError(f"transmission ended inside a packet at bit {self.pos}")
+        self.reset()
+
+    def close(self):
+        self.end_transmission()
+
+    def advance(self):
+        while True:
+            if self.phase == HEADER:
+                if self.available < 6:
+                    return
+                self.version = self.take(3)
+                self.version_total += self.version
+                self.type_id = self.take(3)
+                self.phase = LITERAL_GROUP if self.type_id == LITERAL else OPERATOR_LENGTH
+            elif self.phase == LITERAL_GROUP:
+                if self.available < 5:
+                    return
+                group = self.take(5)
+                self.literal = (self.literal << 4) | (group & 0b1111)
+                if group & 0b10000 == 0:
+                    value, self.literal = self.literal, 0
+                    yield from self.finish(value)
+            elif self.phase == OPERATOR_LENGTH:
+                if self.available < 1:
+                    return
+                by_length = self.bits >> (self.available - 1) == 0
+                if self.available < (16 if by_length else 12):
+                    return
+                self.take(1)
+                limit = self.take(15) if by_length else self.take(11)
+                if by_length:
+                    limit += self.pos
+                self.pending.append(FoldingOperator(self.version, self.type_id, by_length, limit))
+                if self.pending[-1].complete(self.pos):
+                    yield from self.finish(self.pending.pop().value)
+                else:
+                    self.phase = HEADER
+            else:
+                return
+
+    def finish(self, value):
+        while self.pending:
+            self.pending[-1].add(value)
+            if not self.pending[-1].complete(self.pos):
+                self.phase = HEADER
+                return
+            value = self.pending.pop().value
+        yield self.version_total, value
+        # the rest of the line is padding
+        self.phase = PADDING
+        self.bits = self.available = 0
+
+
+async def decode_stream(reader, chunk_size=4096):
+    decoder = IncrementalDecoder()
+    while chunk := await reader.read(chunk_size):
+        for result in decoder.feed(chunk):
+            yield result
+    decoder.close()
 
 
 def main():
     stream = BITSStream(utils.test_input().read().strip())
-    packet = read_packet(stream)
-    packet.pretty_print()
-    print(packet.value())
+    version_sum, value = evaluate(stream)
+    print(f"version sum: {version_sum}")
+    print(value)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,8 @@
 #!/usr/bin/env python3
+import bisect
+import math
+from collections import defaultdict
+import numpy as np
 import utils
 
 
@@ -76,22 +80,94 @@ def valid_velocities(x_data, y_data):
                 yield (vx, vy)
 
 
-def main():
-    x_min, x_max = 96, 125
-    y_min, y_max = -144, -98
-    x_data = [(vx, iters, stopped) for vx, iters, stopped in x_velocities(x_min, x_max)]
-    print(f"x data ({len(x_data)}): {x_data}")
-
-    y_data = [(vy, iters) for vy, iters in y_velocities(y_min, y_max)]
-    print(f"y data ({len(y_data)}): {y_data}")
+def parse(f):
+    x_range, y_range = f.read().strip().replace("target area: ", "").split(", ")
+    x_min, x_max = (int(v) for v in x_range[2:].split(".."))
+    y_min, y_max = (int(v) for v in y_range[2:].split(".."))
+    return x_min, x_max, y_min, y_max
+
+
+def triangle(n):
+    return n * (n + 1) // 2
+
+
+def x_hits(x_min, x_max):
+    # lowest vx that still reaches x_min before stopping
+    vx_min = (math.isqrt(8 * x_min + 1) - 1) // 2
+    if triangle(vx_min) < x_min:
+        vx_min += 1
+    exact = defaultdict(list)
+    stopped = []
+    for vx in range(vx_min, x_max + 1):
+        for vx_iters, n, is_stopped in x_target(vx, x_min, x_max):
+            if is_stopped:
+                stopped.append((n, vx))
+            else:
+                exact[n].append(vx)
+    return exact, sorted(stopped)
+
+
+def y_windows(y_min, y_max):
+    # a probe launched up at vy comes back through y=0 with speed -(vy + 1)
+    for vy in range(y_min, -y_min):
+        steps = [n for _, n in y_targets(vy, y_min, y_max)]
+        if steps:
+            yield vy, steps
+
+
+def solve(x_min, x_max, y_min, y_max):
+    if x_min <= 0 or y_max >= 0:
+        raise ValueError(f"target must be right of and below the launcher: {x_min}..{x_max}, {y_min}..{y_max}")
+    exact, stopped = x_hits(x_min, x_max)
+    stopped_steps = [n for n, _ in stopped]
+
+    velocities = set()
+    for vy, steps in y_windows(y_min, y_max):
+        for n in steps:
+            velocities.update((vx, vy) for vx in exact.get(n, ()))
+        # probes that stopped inside the target by the last step in the window
+        for _, vx in stopped[: bisect.bisect_right(stopped_steps, steps[-1])]:
+            velocities.add((vx, vy))
+
+    max_vy = max(vy for _, vy in velocities)
+    return (triangle(max_vy) if max_vy > 0 else 0), len(velocities)
+
+
+class TrajectoryTable:
+    # positions after steps 1..N for every velocity up to max_range, shared by all target queries
+    def __init__(self, max_range):
+        self.max_range = max_range
+        self.vxs = np.arange(0, max_range + 1)
+        self.vys = np.arange(-max_range, max_range)
+        steps = np.arange(1, 2 * max_range + 3)
+        vx = self.vxs[:, None]
+        self.x = triangle(vx) - triangle(np.maximum(vx - steps, 0))
+        self.y = self.vys[:, None] * steps - steps * (steps - 1) // 2
+
+    def query(self, x_min, x_max, y_min, y_max):
+        if x_min <= 0 or y_max >= 0 or x_max > self.max_range or y_min < -self.max_range:
+            raise ValueError(f"target outside table range {self.max_range}: {x_min}..{x_max}, {y_min}..{y_max}")
+        # x never decreases and y only goes below y_max once, so hits are contiguous step windows
+        x_first = (self.x < x_min).sum(axis=1)
+        x_last = (self.x <= x_max).sum(axis=1) - 1
+        y_first = (self.y > y_max).sum(axis=1)
+        y_last = (self.y >= y_min).sum(axis=1) - 1
+
+        valid = np.maximum(x_first[:, None], y_first[None, :]) <= np.minimum(x_last[:, None], y_last[None, :])
+        count = int(valid.sum())
+        if count == 0:
+            return None, 0
+        max_vy = int(self.vys[valid.any(axis=0)].max())
+        return (triangle(max_vy) if max_vy > 0 else 0), count
+
+    def query_many(self, targets):
+        return [self.query(*target) for target in targets]
 
-    max_vy = max(vy for vy, iters in y_data if valid_y_match(x_data, vy, iters))
-    print(f"max vy: {max_vy}")
 
-    highest_pos = 0 if max_vy <= 0 else y_pos(max_vy, max_vy)
+def main():
+    highest_pos, count = solve(*parse(utils.input()))
     print(f"highest pos: {highest_pos}")
-
-    print(len(set(valid_velocities(x_data, y_data))))
+    print(count)
 
 
 if __name__ == "__main__":
@@ -1,102 +1,103 @@
 #!/usr/bin/env python3
-import copy
 import functools
-import json
 import itertools
 import utils
-import math
-from dataclasses import dataclass
-from typing import Tuple, List
-
-
-@dataclass
-class NodePointer:
-    value: object
-    index: int
-    level: int
-    _position: Tuple[List, int]
-
-    @property
-    def is_primitive(self):
-        return type(self.value) == int
-
-    @property
-    def is_regular(self):
-        return type(self.value) == list and all(type(v) == int for v in self.value)
-
-    def replace(self, new_value):
-        lst, idx = self._position
-        lst[idx] = new_value
-
-
-def pointers(value, level=0, counter=None):
-    counter = counter or itertools.count()
-    for i, elem in enumerate(value):
-        yield NodePointer(elem, next(counter), level + 1, (value, i))
-        if type(elem) != int:
-            yield from pointers(elem, level + 1, counter)
-
-
-def try_explode(value):
-    left_ptr = None
-    exploded_ptr = None
-    right_ptr = None
-
-    for ptr in pointers(value):
-        if exploded_ptr is None:
-            if ptr.is_primitive:
-                left_ptr = ptr
-            elif ptr.level == 4 and ptr.is_regular:
-                exploded_ptr = ptr
-        elif ptr.index > exploded_ptr.index + 2 and ptr.is_primitive:
-            right_ptr = ptr
-            break
-
-    if exploded_ptr:
-        a, b = exploded_ptr.value
-        if left_ptr:
-            left_ptr.replace(left_ptr.value + a)
-        if right_ptr:
-            right_ptr.replace(right_ptr.value + b)
-        exploded_ptr.replace(0)
-        return True
-    return False
-
-
-def try_split(value):
-    for ptr in pointers(value):
-        if ptr.is_primitive and ptr.value >= 10:
-            value = ptr.value
-            ptr.replace([int(math.floor(value / 2)), int(math.ceil(value / 2))])
-            return True
-    return False
+from typing import List, NamedTuple
+
+
+class Snailfish(NamedTuple):
+    # regular numbers left to right, with the number of pairs enclosing each
+    values: List[int]
+    depths: List[int]
+
+    def __str__(self):
+        stack = []
+        for value, depth in zip(self.values, self.depths):
+            stack.append((str(value), depth))
+            while len(stack) > 1 and stack[-1][1] == stack[-2][1]:
+                (a, depth), (b, _) = stack.pop(-2), stack.pop()
+                stack.append((f"[{a},{b}]", depth - 1))
+        return stack[0][0]
+
+
+def parse(line):
+    values = []
+    depths = []
+    depth = 0
+    number = None
+    for c in line.strip():
+        if c.isdigit():
+            number = (number or 0) * 10 + int(c)
+            continue
+        if number is not None:
+            values.append(number)
+            depths.append(depth)
+            number = None
+        if c == "[":
+            depth += 1
+        elif c == "]":
+            depth -= 1
+    return Snailfish(values, depths)
+
+
+def explode(value, i):
+    values, depths = value
+    if i > 0:
+        values[i - 1] += values[i]
+    if i + 2 < len(values):
+        values[i + 2] += values[i + 1]
+    values[i : i + 2] = [0]
+    depths[i : i + 2] = [depths[i] - 1]
+
+
+def split(value, i):
+    values, depths = value
+    half = values[i] // 2
+    values[i : i + 1] = [half, values[i] - half]
+    depths[i : i + 1] = [depths[i] + 1] * 2
 
 
 def sf_reduce(value):
-    while True:
-        if try_explode(value):
-            continue
-        if try_split(value):
+    values, depths = value
+
+    # explosions never create deeper pairs, so one pass handles all of them
+    i = 0
+    while i < len(values):
+        if depths[i] > 4:
+            explode(value, i)
+        i += 1
+
+    # after that, only a split can create a pair to explode, right where it happened
+    i = 0
+    while i < len(values):
+        if values[i] < 10:
+            i += 1
             continue
-        return
+        split(value, i)
+        if depths[i] > 4:
+            explode(value, i)
+            # the number on the left grew and may need splitting first
+            i = max(i - 1, 0)
 
 
 def sf_add(a, b):
-    result = [copy.deepcopy(a), copy.deepcopy(b)]
+    result = Snailfish(a.values + b.values, [d + 1 for d in itertools.chain(a.depths, b.depths)])
     sf_reduce(result)
     return result
 
 
-def magnitude(elem):
-    if type(elem) == int:
-        return elem
-    else:
-        a, b = elem
-        return 3 * magnitude(a) + 2 * magnitude(b)
+def magnitude(value):
+    stack = []
+    for v, depth in zip(value.values, value.depths):
+        stack.append((v, depth))
+        while len(stack) > 1 and stack[-1][1] == stack[-2][1]:
+            (a, depth), (b, _) = stack.pop(-2), stack.pop()
+            stack.append((3 * a + 2 * b, depth - 1))
+    return stack[0][0]
 
 
 def main():
-    numbers = [json.loads(line.strip()) for line in utils.input()]
+    numbers = [parse(line) for line in utils.input() if line.strip()]
     result = functools.reduce(sf_add, numbers)
     print(result)
     print(magnitude(result))
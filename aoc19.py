@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 import itertools
 import utils
+from collections import Counter, defaultdict
 from typing import NamedTuple, Set
 
 SIMILARITY_FACTOR = 12
+OVERLAP_DISTANCES = SIMILARITY_FACTOR * (SIMILARITY_FACTOR - 1) // 2
 
 
 class Position(NamedTuple):
@@ -69,27 +71,65 @@ def orientations(beacons):
             yield [p.with_scanner_facing(f).with_scanner_rotation(r) for p in beacons]
 
 
-def try_merge(existing_beacons, beacons):
+def squared_distance(p1, p2):
+    return (p2.x - p1.x) ** 2 + (p2.y - p1.y) ** 2 + (p2.z - p1.z) ** 2
+
+
+def fingerprint(beacons):
+    result = defaultdict(list)
+    for p1, p2 in itertools.combinations(beacons, 2):
+        result[squared_distance(p1, p2)].append((p1, p2))
+    return result
+
+
+def shared_distances(fingerprint1, fingerprint2):
+    return sum(min(len(fingerprint1[d]), len(fingerprint2[d])) for d in fingerprint1.keys() & fingerprint2.keys())
+
+
+def candidate_pairs(fingerprint1, fingerprint2):
+    votes = Counter()
+    for d in fingerprint1.keys() & fingerprint2.keys():
+        for pair1 in fingerprint1[d]:
+            for pair2 in fingerprint2[d]:
+                for p1, p2 in itertools.product(pair1, pair2):
+                    votes[(p1, p2)] += 1
+    # a beacon seen by both scanners shares a distance with each of the other common beacons
+    return [pair for pair, count in votes.most_common() if count >= SIMILARITY_FACTOR - 1]
+
+
+def align(existing_beacons, beacons, pairs=None):
+    beacons = list(beacons)
     for orientation in orientations(beacons):
-        for existing_beacon in existing_beacons:
-            for candidate_beacon in orientation:
-                dx = existing_beacon.x - candidate_beacon.x
-                dy = existing_beacon.y - candidate_beacon.y
-                dz = existing_beacon.z - candidate_beacon.z
-
-                total = 0
-                for point in orientation:
-                    if not point.translate(dx, dy, dz) in existing_beacons:
-                        continue
-
-                    total += 1
-                    if total >= SIMILARITY_FACTOR:
-                        result = existing_beacons.copy()
-                        result.update(p.translate(dx, dy, dz) for p in orientation)
-                        return result, Position(dx, dy, dz)
+        if pairs is None:
+            candidates = itertools.product(existing_beacons, orientation)
+        else:
+            oriented = dict(zip(beacons, orientation))
+            candidates = ((existing_beacon, oriented[beacon]) for existing_beacon, beacon in pairs)
+
+        for existing_beacon, candidate_beacon in candidates:
+            dx = existing_beacon.x - candidate_beacon.x
+            dy = existing_beacon.y - candidate_beacon.y
+            dz = existing_beacon.z - candidate_beacon.z
+
+            total = 0
+            for point in orientation:
+                if not point.translate(dx, dy, dz) in existing_beacons:
+                    continue
+
+                total += 1
+                if total >= SIMILARITY_FACTOR:
+                    placed = {beacon: p.translate(dx, dy, dz) for beacon, p in zip(beacons, orientation)}
+                    return placed, Position(dx, dy, dz)
     return None, None
 
 
+def try_merge(existing_beacons, beacons, pairs=None):
+    placed, scanner_position = align(existing_beacons, beacons, pairs)
+    if placed is None:
+        return None, None
+    return existing_beacons | set(placed.values()), scanner_position
+
+
 def parse(f):
     scanner_id = None
     beacons = set()
@@ -109,19 +149,40 @@ def parse(f):
 
 def main():
     scanners = list(parse(utils.input()))
-    current_beacons = scanners.pop(0).beacons
+    fingerprints = {scanner.id: fingerprint(scanner.beacons) for scanner in scanners}
+    reference = scanners.pop(0)
+    current_beacons = set(reference.beacons)
     scanner_positions = [Position(0, 0, 0)]
-    while scanners:
-        candidate = scanners.pop(0)
-        updated_beacons, scanner_position = try_merge(current_beacons, candidate.beacons)
-        if updated_beacons:
-            current_beacons = updated_beacons
+
+    # located scanners with their beacons mapped from scanner to global coordinates
+    located = [(reference, {beacon: beacon for beacon in reference.beacons})]
+    while located and scanners:
+        reference, reference_placed = located.pop()
+        reference_beacons = set(reference_placed.values())
+        # distances don't change with rotation or translation, so local fingerprints are reused
+        reference_fingerprint = fingerprints[reference.id]
+        for candidate in list(scanners):
+            candidate_fingerprint = fingerprints[candidate.id]
+            if shared_distances(reference_fingerprint, candidate_fingerprint) < OVERLAP_DISTANCES:
+                continue
+
+            pairs = [
+                (reference_placed[p1], p2) for p1, p2 in candidate_pairs(reference_fingerprint, candidate_fingerprint)
+            ]
+            placed, scanner_position = align(reference_beacons, candidate.beacons, pairs)
+            if placed is None:
+                print(f"failed to merge {candidate.id} with {reference.id}")
+                continue
+
+            scanners.remove(candidate)
+            located.append((candidate, placed))
+            current_beacons.update(placed.values())
             scanner_positions.append(scanner_position)
             print(f"merged {candidate.id} (scanner at {scanner_position})", end=", ")
-        else:
-            scanners.append(candidate)
-            print(f"failed to merge {candidate.id}", end=", ")
-        print(f"{len(scanners)} remaining, {len(current_beacons)} points known")
+            print(f"{len(scanners)} remaining, {len(current_beacons)} points known")
+
+    if scanners:
+        print(f"failed to locate scanners {[scanner.id for scanner in scanners]}")
 
     max_distance = max(p1.distance(p2) for p1, p2 in itertools.combinations(scanner_positions, 2))
     print(f"max scanner distance: {max_distance}")
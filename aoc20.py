@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 from typing import Tuple, Set
 import math
+import numpy as np
 import utils
 from dataclasses import dataclass
 
@@ -59,11 +60,62 @@ def enhance(algo, image):
     return Image(image.min_x - 1, image.min_y - 1, image.max_x + 1, image.max_y + 1, result, default_lit)
 
 
+@dataclass
+class DenseImage:
+    pixels: np.ndarray
+    default_lit: bool
+    remaining_steps: int
+
+    def pixel_count(self):
+        if self.default_lit:
+            return math.inf
+        else:
+            return int(self.pixels.sum())
+
+
+def algo_table(algo):
+    table = np.zeros(512, dtype=bool)
+    table[sorted(algo)] = True
+    return table
+
+
+def to_dense(image, steps):
+    # every step grows the image by one pixel, plus a border ring that always holds the background
+    pad = steps + 1
+    width = image.max_x - image.min_x + 1
+    height = image.max_y - image.min_y + 1
+    pixels = np.full((height + 2 * pad, width + 2 * pad), image.default_lit, dtype=bool)
+    for x, y in image.lit_pixels:
+        pixels[y - image.min_y + pad, x - image.min_x + pad] = not image.default_lit
+    return DenseImage(pixels, image.default_lit, steps)
+
+
+def enhance_dense(table, image):
+    if image.remaining_steps <= 0:
+        raise ValueError("image padding used up, pass a larger step count to to_dense")
+    pixels = image.pixels
+    height, width = pixels.shape
+    positions = np.zeros((height - 2, width - 2), dtype=np.uint16)
+    for dy in (0, 1, 2):
+        for dx in (0, 1, 2):
+            positions <<= 1
+            positions |= pixels[dy : height - 2 + dy, dx : width - 2 + dx]
+
+    default_lit = bool(table[511 if image.default_lit else 0])
+    # the border ring keeps the new background
+    result = np.full(pixels.shape, default_lit, dtype=bool)
+    result[1:-1, 1:-1] = table[positions]
+    return DenseImage(result, default_lit, image.remaining_steps - 1)
+
+
 def main():
+    steps = 50
     algo, image = parse(utils.input())
+    table = algo_table(algo)
+    image = to_dense(image, steps)
     print(image.pixel_count())
-    for _ in range(50):
-        image = enhance(algo, image)
+    for _ in range(steps):
+        image = enhance_dense(table, image)
         print(image.pixel_count())
 
 
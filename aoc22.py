@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import numpy as np
 import utils
 from typing import NamedTuple
 
@@ -82,13 +83,48 @@ def turn_on(current, cube):
     return list(current) + pending
 
 
-def main():
+def solve_fragments(steps):
     turned_on = []
-    for line, (action, cube) in enumerate(parse(utils.input())):
+    for line, (action, cube) in enumerate(steps):
         print(f"line: {line+1}, cube: {cube}, turn on: {action}")
         turned_on = turn_on(turned_on, cube) if action else turn_off(turned_on, cube)
         print(f"total {len(turned_on)} cubes (volume {sum(c.volume for c in turned_on)})")
         print()
+    return sum(c.volume for c in turned_on)
+
+
+def solve_compressed(steps):
+    steps = list(steps)
+    xs = np.unique([c for _, cube in steps for c in (cube.x1, cube.x2)])
+    ys = np.unique([c for _, cube in steps for c in (cube.y1, cube.y2)])
+    zs = np.unique([c for _, cube in steps for c in (cube.z1, cube.z2)])
+    areas = np.outer(np.diff(ys), np.diff(zs))
+
+    compressed = [
+        (
+            action,
+            np.searchsorted(xs, cube.x1),
+            np.searchsorted(xs, cube.x2),
+            slice(np.searchsorted(ys, cube.y1), np.searchsorted(ys, cube.y2)),
+            slice(np.searchsorted(zs, cube.z1), np.searchsorted(zs, cube.z2)),
+        )
+        for action, cube in steps
+    ]
+
+    total = 0
+    plane = np.zeros(areas.shape, dtype=bool)
+    for x in range(len(xs) - 1):
+        plane[:] = False
+        for action, x1, x2, y_range, z_range in compressed:
+            if x1 <= x < x2:
+                # later steps overwrite earlier ones
+                plane[y_range, z_range] = action
+        total += int(xs[x + 1] - xs[x]) * int(areas[plane].sum())
+    return total
+
+
+def main():
+    print(f"total volume {solve_compressed(parse(utils.input()))}")
 
 
 if __name__ == "__main__":
@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
-import sortedcontainers
+import heapq
 import math
 import itertools
-from collections import defaultdict
+from collections import Counter, defaultdict
 from enum import Enum, auto
 import utils
 from typing import Tuple, Optional, NamedTuple
@@ -95,12 +95,62 @@ def room_filled_fully(blocked_cells, current_cell, pod):
     return True
 
 
-def room_has_other_species(blocked_cells, current_cell, pod):
-    for cell in current_cell.room_continuation:
-        occupant_id = blocked_cells.get(cell)
-        if occupant_id is not None and PODS[occupant_id].species != pod.species:
-            return True
-    return False
+class Move(NamedTuple):
+    target: int
+    steps: int
+    path_mask: int
+    support_mask: int
+    needs_empty_room: bool
+
+
+def cell_path(start_id, target_id):
+    previous = {start_id: None}
+    queue = [start_id]
+    for cell_id in queue:
+        for neighbour_id in MAP[cell_id].neighbours:
+            if neighbour_id not in previous:
+                previous[neighbour_id] = cell_id
+                queue.append(neighbour_id)
+
+    path = []
+    while target_id != start_id:
+        path.append(target_id)
+        target_id = previous[target_id]
+    return path
+
+
+def mask_of(cell_ids):
+    return sum(1 << cell_id for cell_id in cell_ids)
+
+
+def build_moves(species, start):
+    for target in MAP:
+        if target.id == start.id or target.kind == CellKind.RoomExit:
+            continue
+        if target.kind == CellKind.Hallway and start.kind == CellKind.Hallway:
+            # hallway pods only move into their room
+            continue
+        if target.kind == CellKind.Room and target.room_species != species:
+            continue
+        if target.room_species == start.room_species and target.render_y < start.render_y:
+            # moving up in own room, can only be part of leaving it
+            continue
+
+        path = cell_path(start.id, target.id)
+        yield Move(
+            target=target.id,
+            steps=len(path),
+            path_mask=mask_of(path),
+            support_mask=mask_of(target.room_continuation[:1]),
+            needs_empty_room=target.kind == CellKind.Room and start.room_species != species,
+        )
+
+
+MOVES = {(species, cell.id): list(build_moves(species, cell)) for species in Species for cell in MAP}
+
+BELOW_MASKS = [mask_of(cell.room_continuation) for cell in MAP]
+
+ROOM_MASKS = {species: mask_of(cell.id for cell in MAP if cell.room_species == species) for species in Species}
 
 
 class GameState(NamedTuple):
@@ -120,6 +170,10 @@ class GameState(NamedTuple):
 
     @staticmethod
     def parse(src):
+        src = [line for line in src if line.strip()]
+        if len(src) == 5:
+            # 2-deep rooms: the bottom half is already filled with settled pods
+            src = src[:4] + ["  #A#B#C#D#"] * 2 + src[4:]
         available_pods = defaultdict(set)
         for pod in PODS:
             available_pods[pod.species.name].add(pod)
@@ -136,73 +190,33 @@ class GameState(NamedTuple):
     def move(self, pod, cell_id):
         return GameState(positions=self.positions[: pod.id] + (cell_id,) + self.positions[pod.id + 1 :])
 
-    def pod_transitions(self, pod, blocked_cells, start, current, prev, cost):
-        if current.room_species == pod.species:
-            if room_filled_fully(blocked_cells, current, pod):
-                # same species occupies the rest of the room, if any
-                return
-
-        next_cost = cost + pod.move_cost()
-        for neighbour_id in current.neighbours:
-            neighbour = MAP[neighbour_id]
-
-            if prev and neighbour_id == prev.id:
-                # came from there
-                continue
-
-            if neighbour_id in blocked_cells:
-                # can't move, occupied
-                continue
-
-            next_state = self.move(pod, neighbour_id)
-            can_stop = True
-
-            if neighbour.kind == CellKind.RoomExit:
-                can_stop = False
-            elif neighbour.kind == CellKind.Room and neighbour.room_species != pod.species:
-                if start.room_species == neighbour.room_species:
-                    # we can leave wrong rooms
-                    can_stop = False
-                else:
-                    # we won't go into wrong rooms
-                    return
-            elif neighbour.kind == CellKind.Room:
-                if start.room_species != pod.species and room_has_other_species(blocked_cells, neighbour, pod):
-                    # don't enter rooms occupied by strangers
-                    continue
-
-                if neighbour.room_continuation:
-                    next_occupant = blocked_cells.get(neighbour.room_continuation[0])
-                    if next_occupant is None or next_occupant == pod.id:
-                        can_stop = False
-            elif start.kind == CellKind.Hallway and neighbour.kind != CellKind.Room:
-                can_stop = False
-
-            if can_stop:
-                yield pod, next_cost, next_state
-
-            yield from next_state.pod_transitions(
-                pod,
-                blocked_cells=blocked_cells,
-                start=start,
-                current=neighbour,
-                prev=current,
-                cost=next_cost,
-            )
-
     def transitions(self):
-        blocked_cells = {cell_id: pod_id for pod_id, cell_id in enumerate(self.positions)}
+        occupied = 0
+        species_masks = {species: 0 for species in Species}
+        for pod_id, cell_id in enumerate(self.positions):
+            occupied |= 1 << cell_id
+            species_masks[PODS[pod_id].species] |= 1 << cell_id
 
         for pod in PODS:
             current_position = self.positions[pod.id]
-            yield from self.pod_transitions(
-                pod,
-                blocked_cells,
-                start=MAP[current_position],
-                current=MAP[current_position],
-                prev=None,
-                cost=0,
-            )
+            own_cells = species_masks[pod.species]
+            if MAP[current_position].room_species == pod.species:
+                below = BELOW_MASKS[current_position]
+                if below & own_cells == below:
+                    # same species occupies the rest of the room, if any
+                    continue
+
+            room_clean = ROOM_MASKS[pod.species] & occupied & ~own_cells == 0
+            for move in MOVES[(pod.species, current_position)]:
+                if move.path_mask & occupied:
+                    continue
+                if move.support_mask and not move.support_mask & occupied:
+                    # would stop above an empty cell of its room
+                    continue
+                if move.needs_empty_room and not room_clean:
+                    # don't enter rooms occupied by strangers
+                    continue
+                yield pod, move.steps * pod.move_cost(), self.move(pod, move.target)
 
     def solved(self):
         for pod in PODS:
@@ -212,40 +226,83 @@ class GameState(NamedTuple):
         return True
 
 
+ROOM_X = {cell.room_species: cell.render_x for cell in MAP if cell.kind == CellKind.Room}
+
+
+def remaining_cost(state):
+    blocked_cells = {cell_id: pod_id for pod_id, cell_id in enumerate(state.positions)}
+    entering = Counter()
+    result = 0
+    for pod in PODS:
+        cell = MAP[state.positions[pod.id]]
+        room_x = ROOM_X[pod.species]
+        if cell.kind != CellKind.Room:
+            steps = abs(cell.render_x - room_x) + 1
+        elif cell.room_species != pod.species:
+            steps = (cell.render_y - 1) + abs(cell.render_x - room_x) + 1
+        elif room_filled_fully(blocked_cells, cell, pod):
+            continue
+        else:
+            # has to step out of the way of a stranger below and come back
+            steps = (cell.render_y - 1) + 3
+        entering[pod.species] += 1
+        result += steps * pod.move_cost()
+
+    for species, count in entering.items():
+        # entering pods fill the top `count` cells of the room
+        result += MOVE_COSTS[species] * count * (count - 1) // 2
+    return result
+
+
 class PendingState(NamedTuple):
+    priority: int
     cost: int
     state: GameState
 
 
-def solve(state):
+class SearchResult(NamedTuple):
+    cost: int
+    expanded: int
+    pushed: int
+
+
+def solve(state, astar=False):
+    def estimate(state):
+        return remaining_cost(state) if astar else 0
+
     costs = {state: 0}
-    iterations = 0
+    expanded = 0
+    pushed = 1
 
-    pending = sortedcontainers.SortedSet()
-    pending.add(PendingState(cost=0, state=state))
+    pending = [PendingState(priority=estimate(state), cost=0, state=state)]
 
     while pending:
-        elem = pending.pop(0)
+        elem = heapq.heappop(pending)
         current_state = elem.state
-        current_cost = costs[current_state]
-        iterations += 1
-        if iterations % 10000 == 0:
-            print(f"considering state with cost {current_cost} ({iterations} examined, {len(pending)} pending)")
+        current_cost = elem.cost
+        if current_cost > costs[current_state]:
+            # superseded by a cheaper path found after this entry was pushed
+            continue
+
+        expanded += 1
+        if expanded % 10000 == 0:
+            print(f"considering state with cost {current_cost} ({expanded} examined, {len(pending)} pending)")
             print(current_state.render())
         if current_state.solved():
-            print(f"solution with cost {current_cost}")
-            return
+            print(f"solution with cost {current_cost} ({expanded} examined, {pushed} pushed)")
+            return SearchResult(current_cost, expanded, pushed)
 
         for pod, move_cost, next_state in current_state.transitions():
             next_cost = current_cost + move_cost
             existing_cost = costs.get(next_state, math.inf)
             if next_cost < existing_cost:
-                try:
-                    pending.remove(PendingState(cost=existing_cost, state=next_state))
-                except KeyError:
-                    pass
                 costs[next_state] = next_cost
-                pending.add(PendingState(cost=next_cost, state=next_state))
+                pushed += 1
+                heapq.heappush(
+                    pending, PendingState(priority=next_cost + estimate(next_state), cost=next_cost, state=next_state)
+                )
+
+    return None
 
 
 def debug_transitions(state):
@@ -258,7 +315,7 @@ def debug_transitions(state):
 def main():
     state = GameState.parse(utils.test_input().read().split("\n"))
     # debug_transitions(state)
-    solve(state)
+    solve(state, astar=True)
 
 
 if __name__ == "__main__":
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import sqlite3
+import numpy as np
 import utils
 import time
 
@@ -45,14 +46,85 @@ def execute(cursor, tokens, debug=False):
         )
 
 
-def main():
+REGISTERS = ("x", "y", "z", "w")
+
+
+def initial_states():
+    return {var: np.zeros(1, dtype=np.int64) for var in REGISTERS + ("num",)}
+
+
+def operand(states, op):
+    return states[op] if op in REGISTERS else np.int64(int(op))
+
+
+def deduplicate(states, largest=False, keys=REGISTERS):
+    num = -states["num"] if largest else states["num"]
+    order = np.lexsort((num,) + tuple(states[var] for var in reversed(keys)))
+    states = {var: column[order] for var, column in states.items()}
+
+    first = np.zeros(len(order), dtype=bool)
+    first[:1] = True
+    for var in keys:
+        first[1:] |= states[var][1:] != states[var][:-1]
+    return {var: column[first] for var, column in states.items()}
+
+
+def execute_vectorized(states, tokens, largest=False):
+    cmd = tokens[0]
+    op1 = tokens[1]
+    states = dict(states)
+    if cmd == "inp":
+        # the old value of op1 is dead, so merge states that only differ there before fanning out
+        states = deduplicate(states, largest, keys=[var for var in REGISTERS if var != op1])
+        count = len(states["num"])
+        digits = np.repeat(np.arange(1, 10, dtype=np.int64), count)
+        for var in REGISTERS + ("num",):
+            states[var] = np.tile(states[var], 9)
+        states[op1] = digits
+        states["num"] = states["num"] * 10 + digits
+        return states
+    else:
+        a = states[op1]
+        b = operand(states, tokens[2])
+        if cmd == "add":
+            # injective, can't produce duplicates
+            states[op1] = a + b
+            return states
+        elif cmd == "mul":
+            states[op1] = a * b
+        elif cmd == "div":
+            # truncates towards zero, like sqlite
+            states[op1] = np.sign(a) * np.sign(b) * (np.abs(a) // np.abs(b))
+        elif cmd == "mod":
+            states[op1] = np.fmod(a, b)
+        elif cmd == "eql":
+            states[op1] = (a == b).astype(np.int64)
+    return deduplicate(states, largest)
+
+
+def solve_vectorized(lines, largest=False):
+    states = initial_states()
+    for idx, line in enumerate(lines):
+        line = line.strip()
+        print(f"[{idx+1}]: {line}")
+
+        start = time.time()
+        states = execute_vectorized(states, line.split(" "), largest=largest)
+        print(f"{len(states['num'])} states, {time.time() - start:.02f} seconds")
+        print()
+
+    valid = states["num"][states["z"] == 0]
+    return (valid.max() if largest else valid.min()) if len(valid) else None
+
+
+def solve_sqlite(lines):
     conn = sqlite3.connect(":memory:")
     cursor = conn.cursor()
 
     cursor.execute("create table states(x int, y int, z int, w int, num int)")
     cursor.execute("insert into states (x, y, z, w, num) values (0, 0, 0, 0, 0)")
 
-    for idx, line in enumerate(utils.test_input()):
+    for idx, line in enumerate(lines):
         line = line.strip()
         print(f"[{idx+1}]: {line}")
         cursor.execute("drop table if exists old_states")
@@ -75,6 +147,11 @@ def main():
 
     cursor.execute("select min(num) from states where z = 0")
     (answer,) = cursor.fetchone()
+    return answer
+
+
+def main():
+    answer = solve_vectorized(utils.test_input())
     print(f"answer: {answer}")
 
 
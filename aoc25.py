@@ -1,52 +1,87 @@
 #!/usr/bin/env python3
 import itertools
+import numpy as np
 import utils
 
 
-def step(cucumbers, moved_kind, width, height):
-    result = []
+def parse_herds(f):
+    grid = np.array([list(line.strip()) for line in f if line.strip()])
+    return grid == ">", grid == "v"
 
-    busy_cells = {(x, y) for (x, y, _) in cucumbers}
-    for (x, y, kind) in cucumbers:
-        if kind != moved_kind:
-            result.append((x, y, kind))
-            continue
 
-        if moved_kind == "v":
-            new_x, new_y = (x, (y + 1) % height)
-        else:
-            new_x, new_y = ((x + 1) % width, y)
+def step_herd(herd, other, axis):
+    blocked = np.roll(herd | other, -1, axis=axis)
+    movers = herd & ~blocked
+    return (herd & ~movers) | np.roll(movers, 1, axis=axis), int(movers.sum())
 
-        if (new_x, new_y) in busy_cells:
-            result.append((x, y, kind))
-        else:
-            result.append((new_x, new_y, kind))
 
-    return sorted(result)
+def step_herds(east, south):
+    east, east_moves = step_herd(east, south, axis=1)
+    south, south_moves = step_herd(south, east, axis=0)
+    return east, south, east_moves + south_moves
 
 
-def render(cucumbers, width, height):
-    result = [["."] * width for _ in range(height + 1)]
-    for (x, y, kind) in cucumbers:
-        result[y][x] = kind
-    print("\n".join("".join(line) for line in result))
-    print()
+def settle(east, south):
+    for i in itertools.count(1):
+        east, south, moves = step_herds(east, south)
+        if moves == 0:
+            return i
+
+
+EMPTY, EAST, SOUTH = range(3)
+KINDS = {".": EMPTY, ">": EAST, "v": SOUTH}
+
+
+def parse_cells(f):
+    lines = [line.strip() for line in f if line.strip()]
+    cells = bytearray(KINDS[char] for line in lines for char in line)
+    return cells, len(lines[0]), len(lines)
+
 
+def settle_frontier(cells, width, height):
+    cells = bytearray(cells)
+    size = width * height
 
-def main():
-    points = [(x, y, char) for (y, line) in enumerate(utils.input()) for (x, char) in enumerate(line.strip())]
-    cucumbers = sorted((x, y, kind) for (x, y, kind) in points if kind != ".")
-    width, height = max((x + 1, y + 1) for x, y, _ in points)
-    render(cucumbers, width, height)
+    def east(idx):
+        return idx + 1 if (idx + 1) % width else idx + 1 - width
 
+    def west(idx):
+        return idx - 1 if idx % width else idx - 1 + width
+
+    def south(idx):
+        return (idx + width) % size
+
+    def north(idx):
+        return (idx - width) % size
+
+    # cucumbers that may be able to move; anything else is blocked until the cell ahead is vacated
+    frontiers = {kind: {idx for idx, cell in enumerate(cells) if cell == kind} for kind in (EAST, SOUTH)}
     for i in itertools.count(1):
-        updated = step(cucumbers, ">", width, height)
-        updated = step(updated, "v", width, height)
-        if updated == cucumbers:
-            print(f"stopped at {i}")
-            return
-        cucumbers = updated
-        render(cucumbers, width, height)
+        moves = 0
+        for kind, ahead in ((EAST, east), (SOUTH, south)):
+            movers = [idx for idx in frontiers[kind] if cells[ahead(idx)] == EMPTY]
+            frontiers[kind] = set()
+            for idx in movers:
+                target = ahead(idx)
+                cells[idx] = EMPTY
+                cells[target] = kind
+                frontiers[kind].add(target)
+            for idx in movers:
+                if cells[west(idx)] == EAST:
+                    frontiers[EAST].add(west(idx))
+                if cells[north(idx)] == SOUTH:
+                    frontiers[SOUTH].add(north(idx))
+            moves += len(movers)
+        if moves == 0:
+            return i
+
+
+def main(incremental=False):
+    if incremental:
+        print(f"stopped at {settle_frontier(*parse_cells(utils.input()))}")
+    else:
+        east, south = parse_herds(utils.input())
+        print(f"stopped at {settle(east, south)}")
 
 
 if __name__ == "__main__":
@@ -1,3 +1,6 @@
+import functools
+import mmap
+from array import array
 from typing import NamedTuple
 
 
@@ -6,42 +9,117 @@ class Point(NamedTuple):
     y: int
 
 
+INPUT = "input-2.txt"
+TEST_INPUT = "input.txt"
+
+ORTHOGONAL = ((-1, 0), (1, 0), (0, -1), (0, 1))
+DIAGONAL = ORTHOGONAL + ((-1, -1), (1, -1), (-1, 1), (1, 1))
+
+# ASCII digits to their values, anything else to 255
+DIGITS = bytes(c - ord("0") if ord("0") <= c <= ord("9") else 255 for c in range(256))
+
+
+class NeighbourView:
+    def __init__(self, width, height, deltas=ORTHOGONAL, wrap=False):
+        self.width = width
+        self.height = height
+        self.deltas = deltas
+        self.wrap = wrap
+
+    def __len__(self):
+        return self.width * self.height
+
+    def __getitem__(self, idx):
+        y, x = divmod(idx, self.width)
+        indices = []
+        for dx, dy in self.deltas:
+            nx, ny = x + dx, y + dy
+            if self.wrap:
+                nx, ny = nx % self.width, ny % self.height
+            elif not (0 <= nx < self.width and 0 <= ny < self.height):
+                continue
+            indices.append(ny * self.width + nx)
+        return indices
+
+
+@functools.lru_cache(16)
+def neighbour_table(width, height, deltas=ORTHOGONAL, wrap=False):
+    view = NeighbourView(width, height, deltas, wrap)
+    return tuple(tuple(view[i]) for i in range(len(view)))
+
+
 class Matrix:
-    def __init__(self, values):
-        self.values = values
+    def __init__(self, values, typecode="i"):
         widths = set(len(line) for line in values)
         if len(widths) != 1:
             raise ValueError(f"inconsistent line sizes: {widths}")
         self.height = len(values)
         self.width = next(iter(widths))
+        self.values = array(typecode, (v for line in values for v in line))
+
+    @classmethod
+    def from_buffer(cls, values, width, height):
+        if len(values) != width * height:
+            raise ValueError(f"buffer size {len(values)} doesn't match {width}x{height}")
+        result = cls.__new__(cls)
+        result.values = values
+        result.width = width
+        result.height = height
+        return result
 
     def __str__(self):
-        return "\n".join("".join(str(c) for c in line) for line in self.values)
+        return "\n".join("".join(str(c) for c in line) for line in self.rows())
+
+    def rows(self):
+        for y in range(self.height):
+            yield self.values[y * self.width : (y + 1) * self.width]
+
+    def index(self, x, y):
+        return y * self.width + x
+
+    def point(self, idx):
+        return Point(idx % self.width, idx // self.width)
 
     def set_value_at(self, x, y, value):
-        self.values[y][x] = value
+        self.values[y * self.width + x] = value
 
     def value_at(self, x, y):
-        return self.values[y][x]
+        return self.values[y * self.width + x]
+
+    def neighbour_table(self, deltas=ORTHOGONAL, wrap=False):
+        return neighbour_table(self.width, self.height, deltas, wrap)
 
     def neighbours(self, x, y):
-        if x > 0:
-            yield Point(x - 1, y)
-        if x < self.width - 1:
-            yield Point(x + 1, y)
-        if y > 0:
-            yield Point(x, y - 1)
-        if y < self.height - 1:
-            yield Point(x, y + 1)
+        for idx in self.neighbour_table()[y * self.width + x]:
+            yield self.point(idx)
 
 
-def test_input():
-    return open("input.txt")
+def test_input(path=TEST_INPUT):
+    return open(path)
 
 
-def input():
-    return open("input-2.txt")
+def input(path=INPUT):
+    return open(path)
 
 
 def read_matrix(f):
-    return Matrix([[int(c) for c in line.strip()] for line in f.readlines()])
+    return Matrix([[int(c) for c in line.strip()] for line in f.readlines()], typecode="B")
+
+
+def load_matrix(path):
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        width = data.find(b"\n")
+        if width == -1:
+            width = len(data)
+        stride = width + 1
+        height = (len(data) + 1) // stride
+        if len(data) not in (height * stride, height * stride - 1) or (len(data) % stride and data[-1] == ord("\n")):
+            raise ValueError(f"inconsistent line sizes: {len(data)} bytes for width {width}")
+
+        # every stride-th byte must be a newline, the last line may lack its own
+        if data[width::stride] != b"\n" * (len(data) // stride):
+            raise ValueError(f"inconsistent line sizes: expected width {width}")
+        values = bytearray(data).translate(DIGITS, b"\n")
+    if values.find(255) != -1:
+        raise ValueError(f"non-digit characters in {path}")
+    return Matrix.from_buffer(values, width, height)